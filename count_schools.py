@@ -158,6 +158,7 @@ def load_csv(
             #     "ULOCALE": "41",
             #     "status05": "1"
             # }
+            line = 0
             try:
                 for line, row in enumerate(csv_reader):
                     entry = {}
@@ -173,7 +174,7 @@ def load_csv(
                 print(f'Error parsing data file on line {line}. This is likely due to mismatched numbers of columns on a row with the schema: {e}')
                 exit(1)
 
-    except FileNotFoundError | PermissionError | OSError as e:
+    except OSError as e:
         print(f'Error loading file: {e}')
         exit(1)
     
@@ -535,4 +536,5 @@ def print_counts() -> None:
 
     print(f'Unique cities with at least one school: {num_cities_with_schools}')
 
-print_counts()
\ No newline at end of file
+if __name__ == '__main__':
+    print_counts()
\ No newline at end of file
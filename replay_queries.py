@@ -0,0 +1,282 @@
+import argparse, contextlib, io, json, math, multiprocessing, threading, time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Upper bounds (in milliseconds) of the latency histogram buckets. Anything slower lands in the overflow bucket.
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+HISTOGRAM_WIDTH = 40
+
+
+def load_query_log(filename: str) -> list[str]:
+    """This function loads the queries to replay from a query log.
+
+    The log holds one query per line. A line may either be the plain query text or a JSON object with the query under
+    the "query" key, so that JSONL logs can be replayed as they are. Blank lines are skipped.
+
+    Parameters
+    ----------
+    filename: str
+        The name of the query log file.
+
+    Returns
+    -------
+    list[str]:
+        The queries in the order that they appear in the log.
+    """
+    queries = []
+
+    try:
+        with open(filename, mode='r', encoding='utf-8') as file:
+            for line_number, line in enumerate(file):
+                line = line.strip()
+                if not line:
+                    continue
+
+                if line.startswith('{'):
+                    try:
+                        queries.append(json.loads(line)['query'])
+                    except (json.JSONDecodeError, KeyError) as e:
+                        print(f'Error parsing query log on line {line_number + 1}: {e}')
+                        exit(1)
+                else:
+                    queries.append(line)
+
+    except OSError as e:
+        print(f'Error loading query log: {e}')
+        exit(1)
+
+    return queries
+
+
+# The school_search module of each worker process. It is imported by init_worker, so that every worker loads the data
+# set once when it starts rather than once per query.
+school_search = None
+
+
+def init_worker(start_barrier: multiprocessing.Barrier) -> None:
+    global school_search
+    import school_search
+
+    # The loader reports its progress on stdout, which would otherwise end up interleaved with the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        school_search.load_data()
+    start_barrier.wait()
+
+
+def run_query(query: str, n: int, use_cache: bool) -> None:
+    if not use_cache:
+        school_search.clear_candidate_cache()
+    school_search.rank_schools(query, n)
+
+
+def replay_queries(
+    queries: list[str], concurrency: int = 1, target_qps: float = 0, n: int = 3, use_cache: bool = True
+) -> tuple[list[float], int, str | None, float]:
+    """This function replays the queries against rank_schools and measures how long each one takes.
+
+    The queries are run by a pool of concurrency worker processes, each with its own copy of the data set. Separate
+    processes are needed because the search is pure Python, so worker threads would only ever run one query at a time.
+    The workers load the data set before the run starts, so loading does not count towards any of the latencies. If
+    any worker fails to load it, a BrokenProcessPool error is raised.
+
+    Each worker keeps the ranked results of its recent queries cached, just like a long running search process would,
+    so a query that repeats in the log is usually served from the cache. Setting use_cache to False clears the cache
+    before every query, so that every query is scored from scratch.
+
+    If target_qps is positive, query i is sent at i / target_qps seconds into the run, whether or not a worker is free,
+    and its latency is measured from that scheduled time. That way time spent queueing behind slow queries still shows
+    up in the latencies instead of being hidden by the load generator slowing down. With target_qps set to 0, a new
+    query is sent as soon as one of the concurrency queries in flight finishes.
+
+    Parameters
+    ----------
+    queries: list[str]
+        The queries to replay.
+    concurrency: int
+        The number of worker processes, which is also the number of queries that can run at once.
+    target_qps: float
+        The rate at which queries are sent, or 0 to not limit the rate.
+    n: int
+        The number of results requested for each query.
+    use_cache: bool
+        Whether queries may be served from the cache of ranked results.
+
+    Returns
+    -------
+    tuple[list[float], int, str | None, float]:
+        A tuple with the latencies in seconds of the successful queries, the number of queries that raised an error,
+        the type and message of the first error (None if there were no errors), and the wall clock duration of the
+        whole run in seconds.
+    """
+    latencies = []
+    errors = 0
+    first_error = None
+    lock = threading.Lock()
+    free_slots = threading.Semaphore(concurrency)
+
+    def record_result(future: Future, scheduled_time: float) -> None:
+        nonlocal errors, first_error
+
+        latency = time.perf_counter() - scheduled_time
+        error = future.exception()
+        with lock:
+            if error is None:
+                latencies.append(latency)
+            else:
+                errors += 1
+                if first_error is None:
+                    first_error = f'{type(error).__name__}: {error}'
+        free_slots.release()
+
+    start_barrier = multiprocessing.Barrier(concurrency)
+    with ProcessPoolExecutor(max_workers=concurrency, initializer=init_worker, initargs=(start_barrier,)) as executor:
+        # Workers are started as tasks are submitted, so we submit one empty task per worker to get them all going. No
+        # worker can take a task before every one of them has loaded the data set and reached the barrier, so all of
+        # them really do get started, and these tasks only finish once every worker is ready. If a worker fails to
+        # start, the pool breaks and the tasks raise BrokenProcessPool instead.
+        warm_up_tasks = [executor.submit(time.sleep, 0) for _ in range(concurrency)]
+        try:
+            for task in warm_up_tasks:
+                task.result()
+        except BrokenProcessPool:
+            start_barrier.abort()
+            raise
+
+        start_time = time.perf_counter()
+        for index, query in enumerate(queries):
+            if target_qps > 0:
+                scheduled_time = start_time + index / target_qps
+                delay = scheduled_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                free_slots.acquire()
+                scheduled_time = time.perf_counter()
+
+            future = executor.submit(run_query, query, n, use_cache)
+            future.add_done_callback(lambda future, scheduled_time=scheduled_time: record_result(future, scheduled_time))
+
+    duration = time.perf_counter() - start_time
+    return latencies, errors, first_error, duration
+
+
+def compute_percentile(sorted_latencies: list[float], percentile: float) -> float:
+    """This function computes a percentile of the latencies using the nearest-rank method.
+
+    Parameters
+    ----------
+    sorted_latencies: list[float]
+        The latencies in ascending order. This must not be empty.
+    percentile: float
+        The percentile to compute, between 0 and 100.
+
+    Returns
+    -------
+    float:
+        The smallest latency that is greater than or equal to the given percentage of all latencies.
+    """
+    rank = max(1, math.ceil(len(sorted_latencies) * percentile / 100))
+    return sorted_latencies[rank - 1]
+
+
+def build_histogram(latencies: list[float]) -> list[tuple[str, int]]:
+    """This function buckets the latencies according to HISTOGRAM_BUCKETS_MS.
+
+    Parameters
+    ----------
+    latencies: list[float]
+        The latencies in seconds.
+
+    Returns
+    -------
+    list[tuple[str, int]]:
+        A list with a label and a count for each bucket, from the fastest bucket to the overflow bucket.
+    """
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for latency in latencies:
+        latency_ms = latency * 1000
+        bucket = len(HISTOGRAM_BUCKETS_MS)
+        for i, upper_bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if latency_ms <= upper_bound:
+                bucket = i
+                break
+        counts[bucket] += 1
+
+    labels = [f'<= {upper_bound}ms' for upper_bound in HISTOGRAM_BUCKETS_MS]
+    labels.append(f'> {HISTOGRAM_BUCKETS_MS[-1]}ms')
+    return list(zip(labels, counts))
+
+
+def print_report(latencies: list[float], errors: int, first_error: str | None, duration: float) -> None:
+    """A method that prints the throughput, latency percentiles and latency histogram of a replay.
+
+    Parameters
+    ----------
+    latencies: list[float]
+        The latencies in seconds of the successful queries.
+    errors: int
+        The number of queries that raised an error.
+    first_error: str | None
+        The type and message of the first error, or None if there were no errors.
+    duration: float
+        The wall clock duration of the whole run in seconds.
+    """
+    total = len(latencies) + errors
+    print(f'Queries: {total} ({errors} errors) in {duration:.3f}s')
+    if first_error is not None:
+        print(f'First error: {first_error}')
+    print(f'Throughput: {len(latencies) / duration if duration > 0 else 0:.1f} queries/s')
+    if not latencies:
+        return
+
+    sorted_latencies = sorted(latencies)
+    p50 = compute_percentile(sorted_latencies, 50) * 1000
+    p99 = compute_percentile(sorted_latencies, 99) * 1000
+    max_latency = sorted_latencies[-1] * 1000
+    print(f'Latency: p50 {p50:.2f}ms, p99 {p99:.2f}ms, max {max_latency:.2f}ms')
+    print()
+
+    histogram = build_histogram(sorted_latencies)
+    max_count = max(count for _, count in histogram)
+    print('Latency histogram:')
+    for label, count in histogram:
+        bar = '#' * round(HISTOGRAM_WIDTH * count / max_count)
+        print(f'   {label:>10} {count:>7} {bar}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Replay a query log against the school search and report latencies.')
+    parser.add_argument('query_log', help='file with one query per line, either as plain text or as JSON')
+    parser.add_argument(
+        '-c', '--concurrency', type=int, default=1,
+        help='number of worker processes, each loading its own copy of the data set'
+    )
+    parser.add_argument('--qps', type=float, default=0, help='target queries per second, or 0 for as fast as possible')
+    parser.add_argument('-n', type=int, default=3, help='number of results requested for each query')
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='score every query from scratch instead of serving repeated queries from the cache of ranked results'
+    )
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+    if args.qps < 0:
+        parser.error('--qps must not be negative')
+    if args.n < 1:
+        parser.error('-n must be at least 1')
+
+    queries = load_query_log(args.query_log)
+    try:
+        latencies, errors, first_error, duration = replay_queries(
+            queries, args.concurrency, args.qps, args.n, use_cache=not args.no_cache
+        )
+    except BrokenProcessPool:
+        print('Error starting the worker processes: a worker failed to load the data set. See the error above.')
+        exit(1)
+
+    print_report(latencies, errors, first_error, duration)
+
+
+if __name__ == '__main__':
+    main()
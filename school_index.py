@@ -0,0 +1,213 @@
+import argparse
+
+from count_schools import load_csv
+
+SCHOOL_ID_COLUMN = 'NCESSCH'
+AGENCY_ID_COLUMN = 'LEAID'
+
+# The columns compared by diff_datasets. Columns that change name every year (e.g. SCHNAM05, SCHNAM06) are given by
+# their prefix and resolved against each file with find_column.
+COMPARED_COLUMNS = {
+    'name': 'SCHNAM',
+    'metro-centric locale': 'MLOCALE',
+    'urban-centric locale': 'ULOCALE',
+    'status': 'STATUS',
+}
+
+
+def build_primary_index(data: list[dict[str, any]], key_column: str) -> dict[str, dict[str, any]]:
+    """This function builds a hash index that maps each value of a unique column to its entry.
+
+    Lookups in the returned dict take O(1) time, instead of the linear scan over the data that would otherwise be
+    needed. Since the key column is expected to be unique, a ValueError is raised if any value appears more than once.
+
+    Parameters
+    ----------
+    data: list[dict]
+        A list of dicts that is supposed to represent each row in a school data file.
+    key_column: str
+        The column to index on, e.g. NCESSCH.
+
+    Returns
+    -------
+    dict[str, dict[str, any]]:
+        A dict that maps each value of the key column to the entry that has it.
+    """
+    index = dict()
+
+    for line, entry in enumerate(data):
+        key = entry[key_column]
+        if key in index:
+            raise ValueError(f'Entry #{line} has the same {key_column} {key} as an earlier entry.')
+        index[key] = entry
+
+    return index
+
+
+def build_secondary_index(data: list[dict[str, any]], key_column: str) -> dict[str, list[dict[str, any]]]:
+    """This function builds a hash index that maps each value of a non-unique column to all of the entries with it.
+
+    Parameters
+    ----------
+    data: list[dict]
+        A list of dicts that is supposed to represent each row in a school data file.
+    key_column: str
+        The column to index on, e.g. LEAID.
+
+    Returns
+    -------
+    dict[str, list[dict[str, any]]]:
+        A dict that maps each value of the key column to the entries that have it, in the order they appear in data.
+    """
+    index = dict()
+
+    for entry in data:
+        key = entry[key_column]
+        if key not in index:
+            index[key] = []
+        index[key].append(entry)
+
+    return index
+
+
+def find_column(column_names: list[str], prefix: str) -> str:
+    """This function finds the column that holds a field, regardless of which school year the file is for.
+
+    Some columns have the school year appended to their name (SCHNAM05 in the 2005-2006 file, SCHNAM06 in the
+    2006-2007 one), while others such as MLOCALE do not. A column matches if it is either named exactly like the prefix
+    or is the prefix followed by digits. Case is ignored, since not every file spells its columns the same way (the
+    2005-2006 file has a lowercase status05 column). If no column matches, a ValueError is raised.
+
+    Parameters
+    ----------
+    column_names: list[str]
+        The names of the columns of a school data file.
+    prefix: str
+        The name of the column without its year, e.g. SCHNAM.
+
+    Returns
+    -------
+    str:
+        The name of the matching column.
+    """
+    prefix = prefix.upper()
+    for name in column_names:
+        upper_name = name.upper()
+        if upper_name == prefix or (upper_name.startswith(prefix) and upper_name[len(prefix):].isdigit()):
+            return name
+
+    raise ValueError(f'No column for {prefix} found in inputted columns {column_names}.')
+
+
+def resolve_columns(column_names: list[str]) -> dict[str, str]:
+    """This function resolves the columns in COMPARED_COLUMNS against the columns of one school data file.
+
+    Parameters
+    ----------
+    column_names: list[str]
+        The names of the columns of a school data file.
+
+    Returns
+    -------
+    dict[str, str]:
+        A dict that maps each field in COMPARED_COLUMNS to the name of the column that holds it in this file.
+    """
+    return {field: find_column(column_names, prefix) for field, prefix in COMPARED_COLUMNS.items()}
+
+
+def diff_datasets(
+    old_data: list[dict[str, any]], old_columns: dict[str, str],
+    new_data: list[dict[str, any]], new_columns: dict[str, str]
+) -> tuple[list[dict[str, any]], list[dict[str, any]], list[tuple[dict[str, any], dict[str, any], list[str]]]]:
+    """This function lines up the same schools across two school data files and reports what changed between them.
+
+    Schools are matched on NCESSCH with a hash join: we build a primary index over the old data and probe it once for
+    every entry of the new data, so the whole comparison takes linear time over both inputs. Matched schools are
+    compared on the fields in COMPARED_COLUMNS. Since NCESSCH is expected to be unique, a ValueError is raised if it
+    appears more than once in either file.
+
+    Parameters
+    ----------
+    old_data: list[dict]
+        A list of dicts that represent each row in the earlier school data file.
+    old_columns: dict[str, str]
+        The columns of the earlier school data file, as returned by resolve_columns.
+    new_data: list[dict]
+        A list of dicts that represent each row in the later school data file.
+    new_columns: dict[str, str]
+        The columns of the later school data file, as returned by resolve_columns.
+
+    Returns
+    -------
+    tuple[list[dict], list[dict], list[tuple[dict, dict, list[str]]]]:
+        A tuple with the entries of schools that were added, the entries of schools that were removed, and for each
+        school that changed, its old entry, its new entry and the list of fields that changed.
+    """
+    old_index = build_primary_index(old_data, SCHOOL_ID_COLUMN)
+    new_ids = set()
+    added = []
+    changed = []
+
+    for line, new_entry in enumerate(new_data):
+        school_id = new_entry[SCHOOL_ID_COLUMN]
+        if school_id in new_ids:
+            raise ValueError(f'Entry #{line} has the same {SCHOOL_ID_COLUMN} {school_id} as an earlier entry.')
+        new_ids.add(school_id)
+
+        old_entry = old_index.get(school_id)
+        if old_entry is None:
+            added.append(new_entry)
+            continue
+
+        changed_fields = [
+            field for field in COMPARED_COLUMNS
+            if old_entry[old_columns[field]] != new_entry[new_columns[field]]
+        ]
+        if changed_fields:
+            changed.append((old_entry, new_entry, changed_fields))
+
+    removed = [entry for entry in old_data if entry[SCHOOL_ID_COLUMN] not in new_ids]
+    return added, removed, changed
+
+
+def print_diff() -> None:
+    """A method that prints which schools were added, removed or changed between two school data files."""
+    parser = argparse.ArgumentParser(description='Compare the schools in two yearly school data files.')
+    parser.add_argument('old_file', help='the earlier school data file')
+    parser.add_argument('new_file', help='the later school data file')
+    args = parser.parse_args()
+
+    old_data, old_column_names = load_csv(args.old_file)
+    new_data, new_column_names = load_csv(args.new_file)
+    print()
+
+    try:
+        old_columns = resolve_columns(old_column_names)
+        new_columns = resolve_columns(new_column_names)
+        added, removed, changed = diff_datasets(old_data, old_columns, new_data, new_columns)
+    except ValueError as e:
+        print(f'Error comparing data files: {e}')
+        exit(1)
+
+    old_name_column = old_columns['name']
+    new_name_column = new_columns['name']
+
+    print(f'Schools added: {len(added)}')
+    for entry in added:
+        print(f'   {entry[SCHOOL_ID_COLUMN]}: {entry[new_name_column]}')
+    print()
+
+    print(f'Schools removed: {len(removed)}')
+    for entry in removed:
+        print(f'   {entry[SCHOOL_ID_COLUMN]}: {entry[old_name_column]}')
+    print()
+
+    print(f'Schools changed: {len(changed)}')
+    for old_entry, new_entry, changed_fields in changed:
+        print(f'   {new_entry[SCHOOL_ID_COLUMN]}: {new_entry[new_name_column]}')
+        for field in changed_fields:
+            print(f'      {field}: {old_entry[old_columns[field]]} -> {new_entry[new_columns[field]]}')
+
+
+if __name__ == '__main__':
+    print_diff()
@@ -1,9 +1,16 @@
-import csv, time
+import bisect, csv, threading, time
+from collections import OrderedDict
+from collections.abc import Iterator
+
+from school_index import AGENCY_ID_COLUMN, SCHOOL_ID_COLUMN, build_primary_index, build_secondary_index, find_column
 
 # Constants
 SCHOOL_NAME_COLUMN = 'SCHNAM05'
 CITY_COLUMN = 'LCITY05'
 STATE_COLUMN = 'LSTATE05'
+METRO_CENTRIC_LOCALE_COLUMN = 'MLOCALE'
+URBAN_CENTRIC_LOCALE_COLUMN = 'ULOCALE'
+STATUS_COLUMN = 'STATUS05'
 PUNCTUATION = "!\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~"
 
 # We use these as stop words because we are looking for schools anyways
@@ -15,6 +22,12 @@ PARTIAL_MATCH_WEIGHT = 0.3
 CITY_MATCH_WEIGHT = 0.05
 STATE_MATCH_WEIGHT = 0.01
 
+# Number of queries whose ranked candidates are kept around to serve later pages of results
+CANDIDATE_CACHE_SIZE = 32
+
+# Categorical columns that the matching schools of a query are counted by
+FACET_COLUMNS = [STATE_COLUMN, URBAN_CENTRIC_LOCALE_COLUMN, METRO_CENTRIC_LOCALE_COLUMN, STATUS_COLUMN]
+
 # Allows the school_search script to search by state
 STATE_ABBREVIATION = {
     'Alabama': 'AL', 'Alaska': 'AK', 'Arizona': 'AZ', 'Arkansas': 'AR',
@@ -81,6 +94,47 @@ def batch_tokenize(data: list[dict[str, any]]) -> list[dict[str, set[str]]]:
         tokenized_data.append(tokens)
     return tokenized_data
 
+
+def encode_column(data: list[dict[str, any]], column: str) -> tuple[list[int], list[str]]:
+    # Dictionary encodes a categorical column: each row gets the index of its value in the list of distinct values,
+    # so that the values can be counted with a list lookup instead of hashing strings
+    codes = []
+    values = []
+    value_codes = {}
+    for entry in data:
+        value = entry[column]
+        if value not in value_codes:
+            value_codes[value] = len(values)
+            values.append(value)
+        codes.append(value_codes[value])
+    return codes, values
+
+
+def encode_facets(data: list[dict[str, any]]) -> dict[str, tuple[list[int], list[str]]]:
+    # Dictionary encodes each column in FACET_COLUMNS, keyed by its name there. Column names are matched regardless of
+    # case (the 2005-2006 file has a lowercase status05 column), and a column the data set does not have is left out
+    # rather than breaking the search.
+    column_names = list(data[0]) if data else []
+    encoded_facets = {}
+    for column in FACET_COLUMNS:
+        try:
+            data_column = find_column(column_names, column)
+        except ValueError:
+            continue
+        encoded_facets[column] = encode_column(data, data_column)
+    return encoded_facets
+
+
+def build_token_index(tokenized_data: list[dict[str, set[str]]]) -> dict[str, list[int]]:
+    # Maps each token to the ids (positions in loaded_data) of the rows that contain it in any column
+    token_index = {}
+    for row_id, tokens in enumerate(tokenized_data):
+        for token in tokens[SCHOOL_NAME_COLUMN] | tokens[CITY_COLUMN] | tokens[STATE_COLUMN]:
+            if token not in token_index:
+                token_index[token] = []
+            token_index[token].append(row_id)
+    return token_index
+
     
 def compute_exact_match(tokens: dict[str, set[str]], keywords: set[str]) -> float:
     school_name_tokens = tokens[SCHOOL_NAME_COLUMN]
@@ -126,41 +180,173 @@ def compute_rank(tokens: dict[str, set[str]], keywords: set[str]) -> float:
         STATE_MATCH_WEIGHT * state_match
     
 
-loaded_data = load_csv("school_data.csv")
-tokenized_data = batch_tokenize(loaded_data)
-print()
+# The data set and everything derived from it. These are filled in by load_data.
+loaded_data = []
+tokenized_data = []
+token_index = {}
+encoded_facets = {}
+
+# Hash indexes for looking up schools by NCESSCH, or all the schools of an agency by LEAID, without a linear scan.
+# They are only built the first time they are needed, so that loading the data set does not pay for them.
+schools_by_id = None
+schools_by_agency = None
+school_index_lock = threading.Lock()
+
+# Maps the keywords of recent queries to their ranked candidates and facet counts, least recently used query first
+candidate_cache = OrderedDict()
+candidate_cache_lock = threading.Lock()
+
+
+def load_data(filename: str = 'school_data.csv') -> None:
+    """Loads the data set that the search functions run against, replacing any data set loaded before."""
+    global loaded_data, tokenized_data, token_index, encoded_facets, schools_by_id, schools_by_agency
+
+    loaded_data = load_csv(filename)
+    tokenized_data = batch_tokenize(loaded_data)
+    token_index = build_token_index(tokenized_data)
+    encoded_facets = encode_facets(loaded_data)
+
+    with school_index_lock:
+        schools_by_id = None
+        schools_by_agency = None
+    clear_candidate_cache()
+
+
+def clear_candidate_cache() -> None:
+    """Forgets the ranked candidates of all previous queries, so that the next search for each of them scores again."""
+    with candidate_cache_lock:
+        candidate_cache.clear()
+
+
+def find_school(school_id: str) -> dict[str, any] | None:
+    """Returns the school with the given NCESSCH, or None if there is no such school.
+
+    Raises a ValueError if the same NCESSCH appears more than once in the data set.
+    """
+    global schools_by_id
+    with school_index_lock:
+        if schools_by_id is None:
+            schools_by_id = build_primary_index(loaded_data, SCHOOL_ID_COLUMN)
+    return schools_by_id.get(school_id)
+
+
+def find_schools_in_agency(agency_id: str) -> list[dict[str, any]]:
+    """Returns all of the schools with the given LEAID, in the order they appear in the data set."""
+    global schools_by_agency
+    with school_index_lock:
+        if schools_by_agency is None:
+            schools_by_agency = build_secondary_index(loaded_data, AGENCY_ID_COLUMN)
+    return schools_by_agency.get(agency_id, [])
+
+
+def rank_candidates(keywords: frozenset[str]) -> tuple[list[tuple[float, int]], dict[str, dict[str, int]]]:
+    with candidate_cache_lock:
+        cached = candidate_cache.get(keywords)
+        if cached is not None:
+            candidate_cache.move_to_end(keywords)
+            return cached
+
+    # Every component of compute_rank needs at least one keyword to appear in the row, so only the rows in the posting
+    # lists of the keywords can have a non-zero score. Everything else can be skipped without being scored.
+    row_ids = set()
+    for keyword in keywords:
+        row_ids.update(token_index.get(keyword, ()))
+
+    # Stored as (-score, -row_id) so that sorting gives the highest scores first. Ties go to the later row, as they
+    # always have in search_schools.
+    candidates = []
+    code_counts = {column: [0] * len(values) for column, (_, values) in encoded_facets.items()}
+    for row_id in row_ids:
+        candidates.append((-compute_rank(tokenized_data[row_id], keywords), -row_id))
+        for column, (codes, _) in encoded_facets.items():
+            code_counts[column][codes[row_id]] += 1
+    candidates.sort()
+
+    facet_counts = {}
+    for column, counts in code_counts.items():
+        values = encoded_facets[column][1]
+        facet_counts[column] = {values[code]: count for code, count in enumerate(counts) if count > 0}
+
+    with candidate_cache_lock:
+        candidate_cache[keywords] = (candidates, facet_counts)
+        if len(candidate_cache) > CANDIDATE_CACHE_SIZE:
+            candidate_cache.popitem(last=False)
+    return candidates, facet_counts
+
+
+def iter_search_results(query: str, cursor: tuple[float, int] | None = None) -> Iterator[dict[str, any]]:
+    """Yields the schools that match the query, from the highest score to the lowest.
+
+    Each result is a dict with the entry, its score and its row id. The cursor is the (score, row_id) pair of the last
+    result the caller has already seen, in which case the results resume right after it. Results with the same score
+    come from the latest row in the data set to the earliest. The ranked candidates of recent queries are cached, so
+    resuming from a cursor only costs a binary search rather than another scan.
+    """
+    keywords = frozenset(tokenize(query, is_query_text=True))
+    if not keywords:
+        return
+
+    candidates, _ = rank_candidates(keywords)
+    start = 0 if cursor is None else bisect.bisect_right(candidates, (-cursor[0], -cursor[1]))
+
+    # Indexing from start rather than slicing, so that a page does not copy all of the candidates after it
+    for index in range(start, len(candidates)):
+        negated_score, negated_row_id = candidates[index]
+        yield {'entry': loaded_data[-negated_row_id], 'score': -negated_score, 'row_id': -negated_row_id}
+
+
+def search_page(
+    query: str, page_size: int = 3, cursor: tuple[float, int] | None = None
+) -> tuple[list[dict[str, any]], tuple[float, int] | None]:
+    """Returns a page of at most page_size results, along with the cursor to pass in to get the next page.
+
+    The returned cursor is None once there are no more results. Raises a ValueError if page_size is less than 1.
+    """
+    if page_size < 1:
+        raise ValueError(f'page_size must be at least 1, not {page_size}.')
+
+    results = []
+    next_cursor = None
+
+    for result in iter_search_results(query, cursor):
+        if len(results) == page_size:
+            next_cursor = (results[-1]['score'], results[-1]['row_id'])
+            break
+        results.append(result)
+
+    return results, next_cursor
 
 
-def search_schools(query: str, n: int = 3) -> None:
-    top_results = []
-    keywords = tokenize(query, is_query_text=True)
-    start_time = time.time()
+def rank_schools(query: str, n: int = 3) -> list[dict[str, any]]:
+    # The top n results are just the first page of results
+    results, _ = search_page(query, n)
+    return results
 
-    for entry, tokens in zip(loaded_data, tokenized_data):
-        score = compute_rank(tokens, keywords)
-        
-        if len(top_results) < n:
-            top_results.append({'entry': entry, 'score': score})
-            continue
 
-        # This may be optimized for a heap if we choose n entries, but with 3 entries it is faster as is.
-        min_index = 0
+def search_facets(query: str) -> dict[str, dict[str, int]]:
+    """Returns how many schools match the query for each value of the columns in FACET_COLUMNS.
 
-        for i in range(1, n): # This is O(1) for small n, like n = 3.
-            if top_results[i]['score'] <= top_results[min_index]['score']:
-                min_index = i
+    The counts are taken over the same candidates that iter_search_results ranks, while they are being scored, and are
+    cached along with them. Asking for the facets of a query that was just searched for therefore costs nothing extra.
+    A column that the data set does not have gets no counts.
+    """
+    keywords = frozenset(tokenize(query, is_query_text=True))
+    if not keywords:
+        return {column: {} for column in FACET_COLUMNS}
 
-        if score >= top_results[min_index]['score']:
-            top_results.pop(min_index)
-            top_results.append({'entry': entry, 'score': score})
-    
+    # The counts are copied so that callers cannot change the ones in the cache
+    _, facet_counts = rank_candidates(keywords)
+    return {column: dict(facet_counts.get(column, {})) for column in FACET_COLUMNS}
+
+
+def search_schools(query: str, n: int = 3) -> None:
+    start_time = time.time()
+    top_results = rank_schools(query, n)
     end_time = time.time()
     elapsed_time = end_time - start_time
 
-    top_results.sort(key=lambda result: result['score'])
-
     print(f'Results for: "{query}" (search took: {elapsed_time:.3f}s)')
-    for i, result in enumerate(top_results[::-1]):
+    for i, result in enumerate(top_results):
         if result['score'] == 0:
             break
         entry = result['entry']
@@ -170,23 +356,31 @@ def search_schools(query: str, n: int = 3) -> None:
         print(f'{i + 1}. {school}')
         print(f'   {city}, {state}')
 
-option = input('Please specify here if you wish to supply your own queries (Y) or use the built-in queries here (N).\n> ')
-while option not in ['N', 'Y']:
-    option = input(f'{option} is not a valid option. Would you like to supply your own queries? Specify Y if yes, or N if no.\n> ')
-
-if option == 'N':
-    search_schools("elementary school highland park")
-    search_schools("jefferson belleville")
-    search_schools("riverside school 44")
-    search_schools("granada charter school")
-    search_schools("foley high alabama")
-    search_schools("KUSKOKWIM")
-else:
-    keep_going = 'Y'
-    while keep_going == 'Y':
-        query = input('Please specify your query here\n> ')
-        search_schools(query)
-        keep_going = input('Would you like to continue (Y/N)?\n> ')
-        while keep_going not in ['N', 'Y']:
-            keep_going = input(f'{keep_going} is not a valid option. Would you like to continue? Specify Y if yes, or N if no.\n> ')
 
+def main() -> None:
+    load_data()
+    print()
+
+    option = input('Please specify here if you wish to supply your own queries (Y) or use the built-in queries here (N).\n> ')
+    while option not in ['N', 'Y']:
+        option = input(f'{option} is not a valid option. Would you like to supply your own queries? Specify Y if yes, or N if no.\n> ')
+
+    if option == 'N':
+        search_schools("elementary school highland park")
+        search_schools("jefferson belleville")
+        search_schools("riverside school 44")
+        search_schools("granada charter school")
+        search_schools("foley high alabama")
+        search_schools("KUSKOKWIM")
+    else:
+        keep_going = 'Y'
+        while keep_going == 'Y':
+            query = input('Please specify your query here\n> ')
+            search_schools(query)
+            keep_going = input('Would you like to continue (Y/N)?\n> ')
+            while keep_going not in ['N', 'Y']:
+                keep_going = input(f'{keep_going} is not a valid option. Would you like to continue? Specify Y if yes, or N if no.\n> ')
+
+
+if __name__ == '__main__':
+    main()
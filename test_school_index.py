@@ -0,0 +1,91 @@
+import unittest
+
+from school_index import build_primary_index, build_secondary_index, diff_datasets, find_column, resolve_columns
+
+COLUMNS_2005 = ['NCESSCH', 'LEAID', 'SCHNAM05', 'MLOCALE', 'ULOCALE', 'status05']
+COLUMNS_2006 = ['NCESSCH', 'LEAID', 'SCHNAM06', 'MLOCALE', 'ULOCALE', 'STATUS06']
+
+
+def make_school(school_id: str, name: str, status: str, year: str = '05') -> dict[str, str]:
+    status_column = 'status05' if year == '05' else 'STATUS06'
+    return {
+        'NCESSCH': school_id,
+        'LEAID': school_id[:7],
+        f'SCHNAM{year}': name,
+        'MLOCALE': '3',
+        'ULOCALE': '41',
+        status_column: status,
+    }
+
+
+class FindColumnTest(unittest.TestCase):
+    def test_finds_year_suffixed_column(self):
+        self.assertEqual(find_column(COLUMNS_2006, 'SCHNAM'), 'SCHNAM06')
+
+    def test_finds_column_without_year(self):
+        self.assertEqual(find_column(COLUMNS_2006, 'MLOCALE'), 'MLOCALE')
+
+    def test_ignores_case(self):
+        self.assertEqual(find_column(COLUMNS_2005, 'STATUS'), 'status05')
+
+    def test_does_not_match_longer_names(self):
+        with self.assertRaises(ValueError):
+            find_column(['STATUSCODE'], 'STATUS')
+
+    def test_missing_column(self):
+        with self.assertRaises(ValueError):
+            find_column(COLUMNS_2005, 'LCITY')
+
+
+class IndexTest(unittest.TestCase):
+    def test_primary_index(self):
+        data = [make_school('010000200277', 'A', '1'), make_school('010000200278', 'B', '1')]
+        index = build_primary_index(data, 'NCESSCH')
+        self.assertIs(index['010000200278'], data[1])
+
+    def test_primary_index_rejects_duplicates(self):
+        data = [make_school('010000200277', 'A', '1'), make_school('010000200277', 'B', '1')]
+        with self.assertRaises(ValueError):
+            build_primary_index(data, 'NCESSCH')
+
+    def test_secondary_index(self):
+        data = [make_school('010000200277', 'A', '1'), make_school('010000299999', 'B', '1')]
+        index = build_secondary_index(data, 'LEAID')
+        self.assertEqual(index['0100002'], data)
+
+
+class DiffDatasetsTest(unittest.TestCase):
+    def test_added_removed_and_changed(self):
+        old_data = [
+            make_school('000000000001', 'SAME', '1'),
+            make_school('000000000002', 'OLD NAME', '1'),
+            make_school('000000000003', 'CLOSING', '1'),
+            make_school('000000000004', 'REMOVED', '1'),
+        ]
+        new_data = [
+            make_school('000000000001', 'SAME', '1', year='06'),
+            make_school('000000000002', 'NEW NAME', '1', year='06'),
+            make_school('000000000003', 'CLOSING', '2', year='06'),
+            make_school('000000000005', 'ADDED', '3', year='06'),
+        ]
+
+        added, removed, changed = diff_datasets(
+            old_data, resolve_columns(COLUMNS_2005), new_data, resolve_columns(COLUMNS_2006)
+        )
+
+        self.assertEqual(added, [new_data[3]])
+        self.assertEqual(removed, [old_data[3]])
+        self.assertEqual(changed, [
+            (old_data[1], new_data[1], ['name']),
+            (old_data[2], new_data[2], ['status']),
+        ])
+
+    def test_rejects_duplicates_in_new_data(self):
+        old_data = [make_school('000000000001', 'A', '1')]
+        new_data = [make_school('000000000001', 'A', '1', year='06'), make_school('000000000001', 'A', '1', year='06')]
+        with self.assertRaises(ValueError):
+            diff_datasets(old_data, resolve_columns(COLUMNS_2005), new_data, resolve_columns(COLUMNS_2006))
+
+
+if __name__ == '__main__':
+    unittest.main()
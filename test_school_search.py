@@ -0,0 +1,188 @@
+import contextlib, csv, io, os, tempfile, unittest
+
+import school_search
+
+COLUMNS = ['NCESSCH', 'LEAID', 'LEANM05', 'SCHNAM05', 'LCITY05', 'LSTATE05', 'LATCOD', 'LONCOD', 'MLOCALE', 'ULOCALE',
+           'STATUS05']
+NAMES = ['HIGHLAND PARK', 'JEFFERSON', 'RIVERSIDE', 'GRANADA', 'FOLEY', 'KUSKOKWIM', 'LINCOLN']
+KINDS = ['ELEMENTARY SCHOOL', 'HIGH SCHOOL', 'MIDDLE SCHOOL', 'CHARTER SCHOOL']
+CITIES = ['PUEBLO', 'BELLEVILLE', 'FOLEY', 'HIGHLAND PARK', 'BETHEL']
+STATES = ['AL', 'CO', 'IL', 'AK']
+
+QUERIES = [
+    'elementary school highland park',
+    'highland park elementary',
+    'jefferson belleville',
+    'riverside school 44',
+    'granada charter school',
+    'foley high',
+    'KUSKOKWIM',
+    'pueblo',
+]
+
+
+def write_rows(rows: list[list[str]], columns: list[str] = COLUMNS) -> str:
+    """Writes the rows to a temporary CSV file and returns its name."""
+    file = tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', encoding='Windows-1252', delete=False)
+    with file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    return file.name
+
+
+def make_rows(count: int) -> list[list[str]]:
+    """Makes count rows that cycle through a small set of names, cities and states, so that many scores tie."""
+    rows = []
+    for i in range(count):
+        name = f'{NAMES[i % len(NAMES)]} {KINDS[i % len(KINDS)]}'
+        rows.append([
+            f'{i:012d}', f'{i // 10:07d}', 'AGENCY', name, CITIES[i % len(CITIES)], STATES[i % len(STATES)],
+            '33.674697', '-86.627775', str(i % 8 + 1), ['11', '21', '41'][i % 3], str(i % 3 + 1),
+        ])
+    return rows
+
+
+def load_rows(rows: list[list[str]], columns: list[str] = COLUMNS) -> None:
+    filename = write_rows(rows, columns)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            school_search.load_data(filename)
+    finally:
+        os.remove(filename)
+
+
+def brute_force_ranking(query: str) -> list[tuple[float, int]]:
+    """Scores every row and returns the (score, row_id) pairs of the matches in the order search results should be in."""
+    keywords = school_search.tokenize(query, is_query_text=True)
+    scores = [
+        (school_search.compute_rank(tokens, keywords), row_id)
+        for row_id, tokens in enumerate(school_search.tokenized_data)
+    ]
+    return sorted(((score, row_id) for score, row_id in scores if score > 0), reverse=True)
+
+
+def collect_pages(query: str, page_size: int) -> list[list[tuple[float, int]]]:
+    pages = []
+    cursor = None
+    while True:
+        results, cursor = school_search.search_page(query, page_size, cursor)
+        pages.append([(result['score'], result['row_id']) for result in results])
+        if cursor is None:
+            return pages
+
+
+class SearchPageTest(unittest.TestCase):
+    def setUp(self):
+        load_rows(make_rows(200))
+
+    def test_pages_match_brute_force_ranking(self):
+        for query in QUERIES:
+            with self.subTest(query=query):
+                pages = collect_pages(query, 7)
+                self.assertEqual([pair for page in pages for pair in page], brute_force_ranking(query))
+                self.assertTrue(all(len(page) == 7 for page in pages[:-1]))
+
+    def test_rank_schools_is_first_page(self):
+        for query in QUERIES:
+            with self.subTest(query=query):
+                top_results = school_search.rank_schools(query)
+                self.assertEqual(
+                    [(result['score'], result['row_id']) for result in top_results], brute_force_ranking(query)[:3]
+                )
+
+    def test_ties_go_to_later_rows(self):
+        results, _ = school_search.search_page('kuskokwim', 3)
+        self.assertEqual(len({result['score'] for result in results}), 1)
+        self.assertEqual([result['row_id'] for result in results], [194, 187, 180])
+
+    def test_empty_query(self):
+        self.assertEqual(school_search.search_page('school !!!'), ([], None))
+        self.assertEqual(list(school_search.iter_search_results('')), [])
+
+    def test_no_matches(self):
+        self.assertEqual(school_search.search_page('zzz'), ([], None))
+
+    def test_final_page_of_exactly_page_size(self):
+        total = len(brute_force_ranking('pueblo'))
+        self.assertEqual(total % 8, 0)
+
+        pages = collect_pages('pueblo', 8)
+        self.assertEqual(len(pages), total // 8)
+        self.assertEqual(len(pages[-1]), 8)
+
+    def test_single_page(self):
+        total = len(brute_force_ranking('pueblo'))
+        self.assertEqual(school_search.search_page('pueblo', total)[1], None)
+
+    def test_cursor_after_cache_is_cleared(self):
+        first_page, cursor = school_search.search_page('jefferson belleville', 5)
+        school_search.clear_candidate_cache()
+        second_page, _ = school_search.search_page('jefferson belleville', 5, cursor)
+        self.assertEqual(
+            [(result['score'], result['row_id']) for result in first_page + second_page],
+            brute_force_ranking('jefferson belleville')[:10]
+        )
+
+    def test_stale_cursor_resumes_after_its_position(self):
+        _, cursor = school_search.search_page('foley high', 5)
+
+        # Reload the data with the school the cursor points at renamed, so that it no longer matches the query
+        rows = make_rows(200)
+        rows[cursor[1]][3] = 'RENAMED'
+        rows[cursor[1]][4] = 'ELSEWHERE'
+        load_rows(rows)
+
+        results, _ = school_search.search_page('foley high', 5, cursor)
+        remaining = [pair for pair in brute_force_ranking('foley high') if pair < cursor]
+        self.assertNotIn(cursor, brute_force_ranking('foley high'))
+        self.assertEqual([(result['score'], result['row_id']) for result in results], remaining[:5])
+
+    def test_rejects_page_size_below_one(self):
+        for page_size in (0, -1):
+            with self.subTest(page_size=page_size):
+                with self.assertRaises(ValueError):
+                    school_search.search_page('pueblo', page_size)
+
+
+class SearchFacetsTest(unittest.TestCase):
+    def expected_facets(self, query: str, columns: list[str] = COLUMNS) -> dict[str, dict[str, int]]:
+        facets = {column: {} for column in school_search.FACET_COLUMNS}
+        for _, row_id in brute_force_ranking(query):
+            entry = school_search.loaded_data[row_id]
+            for column in school_search.FACET_COLUMNS:
+                value = entry[columns[[name.upper() for name in columns].index(column)]]
+                facets[column][value] = facets[column].get(value, 0) + 1
+        return facets
+
+    def test_counts_match_brute_force(self):
+        load_rows(make_rows(200))
+        for query in QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(school_search.search_facets(query), self.expected_facets(query))
+
+    def test_lowercase_status_column(self):
+        columns = [column.lower() if column == 'STATUS05' else column for column in COLUMNS]
+        load_rows(make_rows(200), columns)
+        self.assertEqual(school_search.search_facets('pueblo'), self.expected_facets('pueblo', columns))
+        self.assertNotEqual(school_search.search_facets('pueblo')['STATUS05'], {})
+
+    def test_missing_column_does_not_break_search(self):
+        columns = COLUMNS[:-1]
+        load_rows([row[:-1] for row in make_rows(200)], columns)
+        self.assertEqual(len(school_search.rank_schools('pueblo')), 3)
+        self.assertEqual(school_search.search_facets('pueblo')['STATUS05'], {})
+        self.assertNotEqual(school_search.search_facets('pueblo')['LSTATE05'], {})
+
+    def test_empty_query(self):
+        load_rows(make_rows(200))
+        self.assertEqual(school_search.search_facets(''), {column: {} for column in school_search.FACET_COLUMNS})
+
+    def test_changing_result_does_not_change_cache(self):
+        load_rows(make_rows(200))
+        school_search.search_facets('pueblo')['LSTATE05'].clear()
+        self.assertEqual(school_search.search_facets('pueblo'), self.expected_facets('pueblo'))
+
+
+if __name__ == '__main__':
+    unittest.main()